@@ -71,6 +71,7 @@ autodoc_mock_imports = [
     'pqkmeans',
     'dftpy',
     'asap3',
+    'fdint',
     'openpmd_io'
 ]
 
@@ -4,19 +4,67 @@ Framework for electronic structure learning.
 Can be used to preprocess DFT data (positions / LDOS), train networks,
 predict LDOS and postprocess LDOS into energies (and forces, soon).
 """
+import importlib
 
 from .version import __version__
 from .common import Parameters, printout, check_modules, get_size, get_rank, \
     finalize
-from .descriptors import Bispectrum, Descriptor, AtomicDensity, \
-    MinterpyDescriptors
-from .datahandling import DataHandler, DataScaler, DataConverter, Snapshot, \
-    DataShuffler
-from .network import Network, Tester, Trainer, HyperOpt, \
-    HyperOptOptuna, HyperOptNASWOT, HyperOptOAT, Predictor, \
-    HyperparameterOAT, HyperparameterNASWOT, HyperparameterOptuna, \
-    HyperparameterACSD, ACSDAnalyzer, Runner
-from .targets import LDOS, DOS, Density, fermi_function, \
-    AtomicForce, Target
-from .interfaces import MALA
-from .datageneration import TrajectoryAnalyzer, OFDFTInitializer
+
+# All other subpackages are only imported once one of their classes or
+# functions is accessed (PEP 562). This way, e.g. postprocessing scripts do
+# not have to import the network and hyperparameter optimization modules
+# (and their dependencies).
+_lazy_imports = {
+    "Bispectrum": "mala.descriptors",
+    "Descriptor": "mala.descriptors",
+    "AtomicDensity": "mala.descriptors",
+    "MinterpyDescriptors": "mala.descriptors",
+    "DataHandler": "mala.datahandling",
+    "DataScaler": "mala.datahandling",
+    "DataConverter": "mala.datahandling",
+    "Snapshot": "mala.datahandling",
+    "DataShuffler": "mala.datahandling",
+    "Network": "mala.network",
+    "Tester": "mala.network",
+    "Trainer": "mala.network",
+    "HyperOpt": "mala.network",
+    "HyperOptOptuna": "mala.network",
+    "HyperOptNASWOT": "mala.network",
+    "HyperOptOAT": "mala.network",
+    "Predictor": "mala.network",
+    "HyperparameterOAT": "mala.network",
+    "HyperparameterNASWOT": "mala.network",
+    "HyperparameterOptuna": "mala.network",
+    "HyperparameterACSD": "mala.network",
+    "ACSDAnalyzer": "mala.network",
+    "Runner": "mala.network",
+    "LDOS": "mala.targets",
+    "DOS": "mala.targets",
+    "Density": "mala.targets",
+    "fermi_function": "mala.targets",
+    "AtomicForce": "mala.targets",
+    "Target": "mala.targets",
+    "MALA": "mala.interfaces",
+    "TrajectoryAnalyzer": "mala.datageneration",
+    "OFDFTInitializer": "mala.datageneration",
+}
+
+_lazy_subpackages = ["descriptors", "datahandling", "network", "targets",
+                     "interfaces", "datageneration"]
+
+
+def __getattr__(name):
+    if name in _lazy_imports:
+        module = importlib.import_module(_lazy_imports[name])
+        attribute = getattr(module, name)
+        globals()[name] = attribute
+        return attribute
+    if name in _lazy_subpackages:
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".
+                         format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_lazy_imports.keys()) +
+                  _lazy_subpackages)
@@ -23,7 +23,10 @@ def check_modules():
         "dftpy": {"available": False, "description":
                   "Enables OF-DFT-MD initialization."},
         "minterpy": {"available": False, "description":
-            "Enables minterpy descriptor calculation for data preprocessing."}
+            "Enables minterpy descriptor calculation for data preprocessing."},
+        "fdint": {"available": False, "description":
+                  "Enables fast evaluation of the analytical integration "
+                  "formulas."}
     }
 
     # Find out if libs are available.
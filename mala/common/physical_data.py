@@ -92,17 +92,30 @@ class PhysicalData(ABC):
 
         """
         if array is None:
+            # The units are converted in place, so the data has to be
+            # loaded into a writable array here.
             loaded_array = np.load(path)[:, :, :, self._feature_mask():]
             self._process_loaded_array(loaded_array, units=units)
             return loaded_array
         else:
+            # The data is copied into the provided array anyway, so the file
+            # is only memory-mapped. This way, the OS pages the data in on
+            # demand.
+            memmapped_array = np.load(path, mmap_mode="r")
             if reshape:
-                array_dims = np.shape(array)
-                array[:, :] = np.load(path)[:, :, :, self._feature_mask() :].reshape(
-                    array_dims
-                )
+                if array.flags.c_contiguous:
+                    # Write through a 4D view of the provided array, since
+                    # reshaping the (non-contiguous) masked data would
+                    # create a full copy of it in memory.
+                    array.reshape(memmapped_array.shape[:3] + (-1,))[...] = \
+                        memmapped_array[:, :, :, self._feature_mask() :]
+                else:
+                    array_dims = np.shape(array)
+                    array[:, :] = memmapped_array[:, :, :, self._feature_mask() :].reshape(
+                        array_dims
+                    )
             else:
-                array[:, :, :, :] = np.load(path)[:, :, :, self._feature_mask() :]
+                array[:, :, :, :] = memmapped_array[:, :, :, self._feature_mask() :]
             self._process_loaded_array(array, units=units)
 
     def read_from_openpmd_file(self, path, units=None, array=None):
@@ -1,5 +1,7 @@
 """Base class for all descriptor calculators."""
 from abc import abstractmethod
+import functools
+import importlib
 import os
 
 import ase
@@ -13,6 +15,27 @@ from mala.common.physical_data import PhysicalData
 from mala.descriptors.lammps_utils import set_cmdlinevars
 
 
+@functools.lru_cache(maxsize=128)
+def _parse_qe_fft_dimensions(qe_out_file, modification_time):
+    """
+    Parse the FFT grid dimensions from a Quantum Espresso output file.
+
+    The modification time is only part of the cache key, so that changed
+    files are parsed again. The file is read only up to the first
+    occurence of the FFT dimensions.
+    """
+    grid_dimensions = [0, 0, 0]
+    with open(qe_out_file, "r") as qe_outfile:
+        for line in qe_outfile:
+            if "FFT dimensions" in line:
+                tmp = line.split("(")[1].split(")")[0]
+                grid_dimensions[0] = int(tmp.split(",")[0])
+                grid_dimensions[1] = int(tmp.split(",")[1])
+                grid_dimensions[2] = int(tmp.split(",")[2])
+                break
+    return tuple(grid_dimensions)
+
+
 class Descriptor(PhysicalData):
     """
     Base class for all descriptors available in MALA.
@@ -26,6 +49,17 @@ class Descriptor(PhysicalData):
 
     """
 
+    # Module and class name of the descriptor calculator for each
+    # descriptor type. The modules are only imported when needed.
+    _descriptor_types = {
+        "SNAP": ("mala.descriptors.bispectrum", "Bispectrum"),
+        "Bispectrum": ("mala.descriptors.bispectrum", "Bispectrum"),
+        "AtomicDensity": ("mala.descriptors.atomic_density",
+                          "AtomicDensity"),
+        "MinterpyDescriptors": ("mala.descriptors.minterpy_descriptors",
+                                "MinterpyDescriptors"),
+    }
+
     ##############################
     # Constructors
     ##############################
@@ -43,35 +77,25 @@ class Descriptor(PhysicalData):
         params : mala.common.parametes.Parameters
             Parameters used to create this descriptor calculator.
         """
-        descriptors = None
         # Check if we're accessing through base class.
         # If not, we need to return the correct object directly.
         if cls == Descriptor:
-            if params.descriptors.descriptor_type == 'SNAP':
-                from mala.descriptors.bispectrum import Bispectrum
+            descriptor_type = params.descriptors.descriptor_type
+            if descriptor_type not in Descriptor._descriptor_types:
+                raise Exception("Unsupported descriptor calculator.")
+
+            if descriptor_type == 'SNAP':
                 parallel_warn(
                     "Using 'SNAP' as descriptors will be deprecated "
                     "starting in MALA v1.3.0. Please use 'Bispectrum' "
                     "instead.",  min_verbosity=0, category=FutureWarning)
-                descriptors = super(Descriptor, Bispectrum).__new__(Bispectrum)
-
-            if params.descriptors.descriptor_type == 'Bispectrum':
-                from mala.descriptors.bispectrum import Bispectrum
-                descriptors = super(Descriptor, Bispectrum).__new__(Bispectrum)
 
-            if params.descriptors.descriptor_type == "AtomicDensity":
-                from mala.descriptors.atomic_density import AtomicDensity
-                descriptors = super(Descriptor, AtomicDensity).\
-                    __new__(AtomicDensity)
-
-            if params.descriptors.descriptor_type == "MinterpyDescriptors":
-                from mala.descriptors.minterpy_descriptors import \
-                    MinterpyDescriptors
-                descriptors = super(Descriptor, MinterpyDescriptors).\
-                    __new__(MinterpyDescriptors)
-
-            if descriptors is None:
-                raise Exception("Unsupported descriptor calculator.")
+            module_name, class_name = \
+                Descriptor._descriptor_types[descriptor_type]
+            descriptor_class = getattr(importlib.import_module(module_name),
+                                       class_name)
+            descriptors = super(Descriptor, descriptor_class).\
+                __new__(descriptor_class)
         else:
             descriptors = super(Descriptor, cls).__new__(cls)
 
@@ -215,18 +239,16 @@ class Descriptor(PhysicalData):
 
         # This might be unecessary, but I think it is nice to have some sort of
         # metric here.
-        rescaled_atoms = 0
-        for i in range(0, len(atoms)):
-            if False in (np.isclose(new_atoms[i].position,
-                          atoms[i].position, atol=0.001)):
-                rescaled_atoms += 1
+        rescaled_atoms = np.count_nonzero(
+            np.any(~np.isclose(new_atoms.get_positions(),
+                               atoms.get_positions(), atol=0.001), axis=1))
         printout("Descriptor calculation: had to enforce periodic boundary "
                  "conditions on", rescaled_atoms, "atoms before calculation.",
                  min_verbosity=2)
         return new_atoms
 
     def calculate_from_qe_out(self, qe_out_file, working_directory=".",
-                              **kwargs):
+                              atoms=None, **kwargs):
         """
         Calculate the descriptors based on a Quantum Espresso outfile.
 
@@ -240,6 +262,12 @@ class Descriptor(PhysicalData):
             Usually the local directory should suffice, given that there
             are no multiple instances running in the same directory.
 
+        atoms : ase.Atoms
+            Atoms object holding the atomic configuration of qe_out_file,
+            if it has already been read. If None, the atoms are read from
+            qe_out_file with ASE. In both cases, the PBC are enforced on
+            (a copy of) the atoms before the calculation.
+
         Returns
         -------
         descriptors : numpy.array
@@ -250,8 +278,10 @@ class Descriptor(PhysicalData):
         self.in_format_ase = "espresso-out"
         printout("Calculating descriptors from", qe_out_file,
                  min_verbosity=0)
-        # We get the atomic information by using ASE.
-        atoms = ase.io.read(qe_out_file, format=self.in_format_ase)
+        # We get the atomic information by using ASE, unless it has already
+        # been provided.
+        if atoms is None:
+            atoms = ase.io.read(qe_out_file, format=self.in_format_ase)
 
         # Enforcing / Checking PBC on the read atoms.
         atoms = self.enforce_pbc(atoms)
@@ -264,17 +294,16 @@ class Descriptor(PhysicalData):
             # dict below.
             del kwargs["grid_dimensions"]
         else:
-            qe_outfile = open(qe_out_file, "r")
-            lines = qe_outfile.readlines()
-            grid_dimensions = [0, 0, 0]
-
-            for line in lines:
-                if "FFT dimensions" in line:
-                    tmp = line.split("(")[1].split(")")[0]
-                    grid_dimensions[0] = int(tmp.split(",")[0])
-                    grid_dimensions[1] = int(tmp.split(",")[1])
-                    grid_dimensions[2] = int(tmp.split(",")[2])
-                    break
+            # With MPI, only rank 0 parses the file and shares the result.
+            if self.parameters._configuration["mpi"]:
+                grid_dimensions = None
+                if get_rank() == 0:
+                    grid_dimensions = list(_parse_qe_fft_dimensions(
+                        qe_out_file, os.path.getmtime(qe_out_file)))
+                grid_dimensions = get_comm().bcast(grid_dimensions, root=0)
+            else:
+                grid_dimensions = list(_parse_qe_fft_dimensions(
+                    qe_out_file, os.path.getmtime(qe_out_file)))
 
         return self._calculate(atoms,
                                working_directory, grid_dimensions, **kwargs)
@@ -326,13 +355,10 @@ class Descriptor(PhysicalData):
 
         use_pickled_comm : bool
             If True, the pickled communication route from mpi4py is used.
-            If False, a Recv/Sendv combination is used. I am not entirely
-            sure what is faster. Technically Recv/Sendv should be faster,
-            but I doubt my implementation is all that optimal. For the pickled
-            route we can use gather(), which should be fairly quick.
-            However, for large grids, one CANNOT use the pickled route;
-            too large python objects will break it. Therefore, I am setting
-            the Recv/Sendv route as default.
+            If False, the descriptors are collected via Gatherv into a
+            single buffer. For large grids, one CANNOT use the pickled route;
+            too large python objects will break it. Therefore, the Gatherv
+            route is the default.
         """
         # Barrier to make sure all ranks have descriptors..
         comm = get_comm()
@@ -343,32 +369,42 @@ class Descriptor(PhysicalData):
             all_descriptors_list = comm.gather(descriptors_np,
                                                root=0)
         else:
+            # I think we should refrain from top-level MPI imports; the first
+            # import triggers an MPI init, which can take quite long.
+            from mpi4py.util.dtlib import from_numpy_dtype
+
             sendcounts = np.array(comm.gather(np.shape(descriptors_np)[0],
                                               root=0))
             raw_feature_length = self.fingerprint_length+3
 
+            # All descriptors are gathered into one contiguous buffer
+            # in a single collective operation. Counts and displacements
+            # are given in rows (one row = one grid point), so that they
+            # stay within the range of a C int even for large grids.
+            descriptors_np = np.ascontiguousarray(descriptors_np)
+            rowtype = from_numpy_dtype(descriptors_np.dtype).\
+                Create_contiguous(raw_feature_length).Commit()
             if get_rank() == 0:
                 # print("sendcounts: {}, total: {}".format(sendcounts,
                 #                                          sum(sendcounts)))
-
-                # Preparing the list of buffers.
-                all_descriptors_list = []
-                for i in range(0, get_size()):
-                    all_descriptors_list.append(
-                        np.empty(sendcounts[i] * raw_feature_length,
-                                 dtype=descriptors_np.dtype))
-
-                # No MPI necessary for first rank. For all the others,
-                # collect the buffers.
-                all_descriptors_list[0] = descriptors_np
-                for i in range(1, get_size()):
-                    comm.Recv(all_descriptors_list[i], source=i,
-                              tag=100+i)
-                    all_descriptors_list[i] = \
-                        np.reshape(all_descriptors_list[i],
-                                   (sendcounts[i], raw_feature_length))
+                all_descriptors_flat = \
+                    np.empty(np.sum(sendcounts) * raw_feature_length,
+                             dtype=descriptors_np.dtype)
+                recvbuf = [all_descriptors_flat, sendcounts.tolist(), rowtype]
             else:
-                comm.Send(descriptors_np, dest=0, tag=get_rank() + 100)
+                recvbuf = None
+            comm.Gatherv([descriptors_np, np.shape(descriptors_np)[0],
+                          rowtype], recvbuf, root=0)
+            rowtype.Free()
+
+            if get_rank() == 0:
+                # The descriptors of the individual ranks are views into
+                # the gathered buffer.
+                all_descriptors_list = \
+                    np.split(np.reshape(all_descriptors_flat,
+                                        (np.sum(sendcounts),
+                                         raw_feature_length)),
+                             np.cumsum(sendcounts)[:-1])
             barrier()
 
         # if get_rank() == 0:
@@ -383,27 +419,36 @@ class Descriptor(PhysicalData):
 
         # Reorder the list.
         if get_rank() == 0:
+            # The first three entries of each gathered row are the grid
+            # indices, followed by the x,y,z coordinates. If the latter are
+            # not needed, they are not copied into the full array at all.
+            if self.parameters.descriptors_contain_xyz:
+                first_feature = 3
+            else:
+                first_feature = 6
+            feature_length = self.fingerprint_length + 3 - first_feature
+
             # Prepare the descriptor array.
             nx = self.grid_dimensions[0]
             ny = self.grid_dimensions[1]
             nz = self.grid_dimensions[2]
-            descriptors_full = np.zeros(
-                [nx, ny, nz, self.fingerprint_length])
+            # Every entry is overwritten by the local grids below, so the
+            # array does not need to be initialized.
+            descriptors_full = np.empty([nx, ny, nz, feature_length])
             # Fill the full SNAP descriptors array.
             for idx, local_grid in enumerate(all_descriptors_list):
                 # We glue the individual cells back together, and transpose.
-                first_x = int(local_grid[0][0])
-                first_y = int(local_grid[0][1])
-                first_z = int(local_grid[0][2])
-                last_x = int(local_grid[-1][0])+1
-                last_y = int(local_grid[-1][1])+1
-                last_z = int(local_grid[-1][2])+1
+                # The grid indices of the first and last point of the local
+                # grid are extracted at once.
+                bounds = local_grid[[0, -1], :3].astype(np.intp)
+                first_x, first_y, first_z = bounds[0].tolist()
+                last_x, last_y, last_z = (bounds[1] + 1).tolist()
                 descriptors_full[first_x:last_x,
                                  first_y:last_y,
                                  first_z:last_z] = \
-                    np.reshape(local_grid[:, 3:],
+                    np.reshape(local_grid[:, first_feature:],
                                [last_z-first_z, last_y-first_y, last_x-first_x,
-                                self.fingerprint_length]).\
+                                feature_length]).\
                     transpose([2, 1, 0, 3])
 
                 # Leaving this in here for debugging purposes.
@@ -413,10 +458,12 @@ class Descriptor(PhysicalData):
                 #     y = int(entry[1])
                 #     z = int(entry[2])
                 #     descriptors_full[x, y, z] = entry[3:]
-        if self.parameters.descriptors_contain_xyz:
             return descriptors_full
         else:
-            return descriptors_full[:, :, :, 3:]
+            if self.parameters.descriptors_contain_xyz:
+                return descriptors_full
+            else:
+                return descriptors_full[:, :, :, 3:]
 
     def convert_local_to_3d(self, descriptors_np):
         """
@@ -434,19 +481,16 @@ class Descriptor(PhysicalData):
         descriptors_np : numpy.array
             Numpy array with the descriptors of this ranks local grid.
         """
-        local_offset = [None, None, None]
-        local_reach = [None, None, None]
-        local_offset[0] = int(descriptors_np[0][0])
-        local_offset[1] = int(descriptors_np[0][1])
-        local_offset[2] = int(descriptors_np[0][2])
-        local_reach[0] = int(descriptors_np[-1][0]) + 1
-        local_reach[1] = int(descriptors_np[-1][1]) + 1
-        local_reach[2] = int(descriptors_np[-1][2]) + 1
+        # The grid indices of the first and last point of the local grid
+        # are extracted at once.
+        bounds = descriptors_np[[0, -1], :3].astype(np.intp)
+        local_offset = bounds[0].tolist()
+        local_reach = (bounds[1] + 1).tolist()
         nx = local_reach[0] - local_offset[0]
         ny = local_reach[1] - local_offset[1]
         nz = local_reach[2] - local_offset[2]
 
-        descriptors_full = np.zeros([nx, ny, nz, self.fingerprint_length])
+        descriptors_full = np.empty([nx, ny, nz, self.fingerprint_length])
 
         descriptors_full[0:nx, 0:ny, 0:nz] = \
             np.reshape(descriptors_np[:, 3:],
@@ -590,33 +634,25 @@ class Descriptor(PhysicalData):
                 # integer value
                 if int(ny / yprocs) == (ny / yprocs):
                     ycut = 1/yprocs
-                    yint = ''
-                    for i in range(0, yprocs-1):
-                        yvals = ((i+1)*ycut)-0.00000001
-                        yint += format(yvals, ".8f")
-                        yint += ' '
+                    yint = self.__balance_string(
+                        [((i+1)*ycut)-0.00000001
+                         for i in range(0, yprocs-1)])
                 else:
                     # account for remainder with uneven number of
                     # planes/processors
                     ycut = 1/yprocs
                     yrem = ny - (yprocs*int(ny/yprocs))
-                    yint = ''
-                    for i in range(0, yrem):
-                        yvals = (((i+1)*2)*ycut)-0.00000001
-                        yint += format(yvals, ".8f")
-                        yint += ' '
-                    for i in range(yrem, yprocs-1):
-                        yvals = ((i+1+yrem)*ycut)-0.00000001
-                        yint += format(yvals, ".8f")
-                        yint += ' '
+                    yint = self.__balance_string(
+                        [(((i+1)*2)*ycut)-0.00000001
+                         for i in range(0, yrem)] +
+                        [((i+1+yrem)*ycut)-0.00000001
+                         for i in range(yrem, yprocs-1)])
                 # prepare z plane cuts for balance command in lammps
                 if int(nz / zprocs) == (nz / zprocs):
                     zcut = 1/nz
-                    zint = ''
-                    for i in range(0, zprocs-1):
-                        zvals = ((i + 1) * (nz / zprocs) * zcut) - 0.00000001
-                        zint += format(zvals, ".8f")
-                        zint += ' '
+                    zint = self.__balance_string(
+                        [((i + 1) * (nz / zprocs) * zcut) - 0.00000001
+                         for i in range(0, zprocs-1)])
                 else:
                     # account for remainder with uneven number of
                     # planes/processors
@@ -668,26 +704,20 @@ class Descriptor(PhysicalData):
                     if int(nz / zprocs) == (nz / zprocs):
                         printout("No remainder in z")
                         zcut = 1/nz
-                        zint = ''
-                        for i in range(0, zprocs-1):
-                            zvals = ((i+1)*(nz/zprocs)*zcut)-0.00000001
-                            zint += format(zvals, ".8f")
-                            zint += ' '
+                        zint = self.__balance_string(
+                            [((i+1)*(nz/zprocs)*zcut)-0.00000001
+                             for i in range(0, zprocs-1)])
                     else:
                         #raise ValueError("Cannot divide z-planes on processors"
                         #                 " without remainder. "
                         #                 "This is currently unsupported.")
                         zcut = 1/nz
                         zrem = nz - (zprocs*int(nz/zprocs))
-                        zint = ''
-                        for i in range(0, zrem):
-                            zvals = (((i+1)*(int(nz/zprocs)+1))*zcut)-0.00000001
-                            zint += format(zvals, ".8f")
-                            zint += ' '
-                        for i in range(zrem, zprocs-1):
-                            zvals = (((i+1)*int(nz/zprocs)+zrem)*zcut)-0.00000001
-                            zint += format(zvals, ".8f")
-                            zint += ' '
+                        zint = self.__balance_string(
+                            [(((i+1)*(int(nz/zprocs)+1))*zcut)-0.00000001
+                             for i in range(0, zrem)] +
+                            [(((i+1)*int(nz/zprocs)+zrem)*zcut)-0.00000001
+                             for i in range(zrem, zprocs-1)])
 
                     lammps_dict["lammps_procs"] = f"processors {lammps_procs}"
                     lammps_dict["zbal"] = f"balance 1.0 z {zint}"
@@ -730,6 +760,12 @@ class Descriptor(PhysicalData):
 
         return lmp
 
+    @staticmethod
+    def __balance_string(plane_cuts):
+        """Format the plane cuts for the LAMMPS balance command."""
+        return "".join(format(plane_cut, ".8f") + " "
+                       for plane_cut in plane_cuts)
+
     @abstractmethod
     def _calculate(self, atoms, outdir, grid_dimensions, **kwargs):
         pass
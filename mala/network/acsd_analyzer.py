@@ -521,8 +521,8 @@ class ACSDAnalyzer(HyperOpt):
             A (2,nr_points*nr_points) array containing the cosine similarities.
 
         """
-        descriptor_dim = np.shape(descriptor_data)
-        ldos_dim = np.shape(ldos_data)
+        descriptor_dim = descriptor_data.shape
+        ldos_dim = ldos_data.shape
         if len(descriptor_dim) == 4:
             descriptor_data = np.reshape(descriptor_data,
                                          (descriptor_dim[0] *
@@ -540,31 +540,30 @@ class ACSDAnalyzer(HyperOpt):
         elif len(ldos_dim) != 2:
             raise Exception("Cannot work with this LDOS data.")
 
-        similarity_array = []
-        # Draw nr_points at random from snapshot.
+        # Draw two sets of nr_points at random from snapshot. The cosine
+        # similarities are then calculated for all pairs between these
+        # two sets at once. If the snapshot is large enough, the two sets
+        # are disjoint, so that no point is compared with itself.
         rng = np.random.default_rng()
-        points_i = rng.choice(np.shape(descriptor_data)[0],
-                              size=np.shape(descriptor_data)[0],
-                              replace=False)
-        for i in range(0, nr_points):
-            # Draw another nr_points at random from snapshot.
-            rng = np.random.default_rng()
-            points_j = rng.choice(np.shape(descriptor_data)[0],
-                                  size=np.shape(descriptor_data)[0],
+        number_of_points = descriptor_data.shape[0]
+        if 2 * nr_points <= number_of_points:
+            points_i, points_j = np.split(
+                rng.choice(number_of_points, size=2 * nr_points,
+                           replace=False), 2)
+        else:
+            points_i = rng.choice(number_of_points, size=nr_points,
+                                  replace=False)
+            points_j = rng.choice(number_of_points, size=nr_points,
                                   replace=False)
 
-            for j in range(0, nr_points):
-                # Calculate similarities between these two pairs.
-                descriptor_distance = \
-                    ACSDAnalyzer.__calc_cosine_similarity(
-                        descriptor_data[points_i[i]],
-                        descriptor_data[points_j[j]])
-                ldos_distance = ACSDAnalyzer.\
-                    __calc_cosine_similarity(ldos_data[points_i[i]],
-                                             ldos_data[points_j[j]])
-                similarity_array.append([descriptor_distance, ldos_distance])
-
-        return np.array(similarity_array)
+        descriptor_similarities = ACSDAnalyzer.\
+            __calc_cosine_similarities(descriptor_data[points_i],
+                                       descriptor_data[points_j])
+        ldos_similarities = ACSDAnalyzer.\
+            __calc_cosine_similarities(ldos_data[points_i],
+                                       ldos_data[points_j])
+        return np.stack([descriptor_similarities.ravel(),
+                         ldos_similarities.ravel()], axis=1)
 
     @staticmethod
     def _calculate_acsd(descriptor_data, ldos_data, acsd_points,
@@ -599,32 +598,42 @@ class ACSDAnalyzer(HyperOpt):
             The average cosine similarity distance.
 
         """
-        def distance_between_points(x1, y1, x2, y2):
-            return np.sqrt((x1 - x2) * (x1 - x2) + (y1 - y2) * (y1 - y2))
-
         similarity_data = ACSDAnalyzer.\
             _calculate_cosine_similarities(descriptor_data, ldos_data,
                                            acsd_points,
                                            descriptor_vectors_contain_xyz=
                                            descriptor_vectors_contain_xyz)
-        data_size = np.shape(similarity_data)[0]
-        distances = []
-        for i in range(0, data_size):
-            distances.append(distance_between_points(similarity_data[i, 0],
-                                                     similarity_data[i, 1],
-                                                     similarity_data[i, 0],
-                                                     similarity_data[i, 0]))
+
+        # The distance of each point (descriptor similarity, LDOS
+        # similarity) to the diagonal point (descriptor similarity,
+        # descriptor similarity) is simply the absolute difference of the
+        # two similarities.
+        distances = np.abs(similarity_data[:, 0] - similarity_data[:, 1])
         return np.mean(distances)
 
     @staticmethod
-    def __calc_cosine_similarity(vector1, vector2, norm=2):
-        if np.shape(vector1)[0] != np.shape(vector2)[0]:
+    def __calc_cosine_similarities(vectors1, vectors2):
+        """
+        Calculate the cosine similarities between two sets of vectors.
+
+        The result is a matrix containing the cosine similarities for all
+        pairs of the (row) vectors in vectors1 and vectors2.
+        """
+        if vectors1.shape[1] != vectors2.shape[1]:
             raise Exception("Cannot calculate similarity between vectors "
                             "of different dimenstions.")
-        if np.shape(vector1)[0] == 1:
-            return np.min([vector1[0], vector2[0]]) / \
-                   np.max([vector1[0], vector2[0]])
+        if vectors1.shape[1] == 1:
+            return np.minimum.outer(vectors1[:, 0], vectors2[:, 0]) / \
+                   np.maximum.outer(vectors1[:, 0], vectors2[:, 0])
         else:
-            return np.dot(vector1, vector2) / \
-                   (np.linalg.norm(vector1, ord=norm) *
-                    np.linalg.norm(vector2, ord=norm))
+            # Normalize in place, the vectors are copies of the data.
+            vectors1 = vectors1.astype(np.float64)
+            vectors2 = vectors2.astype(np.float64)
+            tiny = np.finfo(np.float64).tiny
+            np.divide(vectors1, np.maximum(np.linalg.norm(vectors1, axis=1,
+                                                          keepdims=True),
+                                           tiny), out=vectors1)
+            np.divide(vectors2, np.maximum(np.linalg.norm(vectors2, axis=1,
+                                                          keepdims=True),
+                                           tiny), out=vectors2)
+            return np.dot(vectors1, vectors2.T)
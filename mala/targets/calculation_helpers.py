@@ -1,9 +1,49 @@
 """Helper functions for several calculation tasks (such as integration)."""
+import functools
+import math
+import os
+
 from ase.units import kB
 import mpmath as mp
 import numpy as np
 from scipy import integrate
 import sys
+try:
+    from fdint import fdk
+except ModuleNotFoundError:
+    fdk = None
+
+# Memory (in bytes) used for chunked operations on (L)DOS data, if the
+# available memory cannot be determined.
+_DEFAULT_CHUNK_MEMORY = 256 * 1024 * 1024
+
+
+def get_chunk_size(bytes_per_row):
+    """
+    Get the number of rows of an array that can be processed at once.
+
+    Large (L)DOS arrays are processed in chunks of rows (grid points), so
+    that temporary arrays do not exceed the memory budget. As budget, a
+    quarter of the currently available physical memory is used.
+
+    Parameters
+    ----------
+    bytes_per_row : int
+        Memory (in bytes) needed per row for the operation performed on
+        the chunks, including temporary arrays.
+
+    Returns
+    -------
+    chunk_size : int
+        Number of rows per chunk.
+    """
+    try:
+        memory_budget = os.sysconf("SC_AVPHYS_PAGES") * \
+            os.sysconf("SC_PAGE_SIZE") / 4
+    except (AttributeError, ValueError, OSError):
+        memory_budget = _DEFAULT_CHUNK_MEMORY
+    return max(1, int(memory_budget // bytes_per_row))
+
 
 def integrate_values_on_spacing(values, spacing, method, axis=0):
     """
@@ -53,8 +93,10 @@ def fermi_function(energy, fermi_energy, temperature,
         Energy for which the Fermi function is supposed to be calculated in
         energy_units.
 
-    fermi_energy : float
-        Fermi energy level in energy_units.
+    fermi_energy : float or numpy.array
+        Fermi energy level in energy_units. If an array is provided, the
+        Fermi function is evaluated for all Fermi energies at once, and
+        the result has the shape fermi_energy.shape + energy.shape.
 
     temperature : float
         Temperature in K.
@@ -66,11 +108,21 @@ def fermi_function(energy, fermi_energy, temperature,
 
     Returns
     -------
-    fermi_val : float
+    fermi_val : float or numpy.array
         Value of the Fermi function.
 
     """
-    exponent = (energy - fermi_energy) / (kB * temperature)
+    if isinstance(fermi_energy, np.ndarray):
+        # One entry per Fermi energy, e.g. a row per Fermi energy for an
+        # energy grid. The exponent is modified in place below, so it has
+        # to be a floating point array even for integer inputs.
+        exponent = np.subtract.outer(
+            fermi_energy, energy,
+            dtype=np.result_type(fermi_energy, energy, np.float32))
+        np.negative(exponent, out=exponent)
+        exponent /= kB * temperature
+    else:
+        exponent = (energy - fermi_energy) / (kB * temperature)
 
     if suppress_overflow:
         # Maximum exponent that will not result in inf when performing
@@ -84,13 +136,24 @@ def fermi_function(energy, fermi_energy, temperature,
         # Since this function works both for arrays and scalars,
         # we have to check which maximum to use.
 
-        if isinstance(energy, np.ndarray):
+        if isinstance(exponent, np.ndarray):
+            # In single precision, log(max) rounds up, so the next smaller
+            # value is used.
             max_exponent = np.log(np.finfo(exponent.dtype).max)
-            exponent[exponent > max_exponent] = max_exponent
+            max_exponent = np.nextafter(exponent.dtype.type(max_exponent),
+                                        exponent.dtype.type(0))
+            np.minimum(exponent, max_exponent, out=exponent)
         else:
             exponent = min(exponent, np.log(np.finfo(exponent).max))
 
-    return 1.0 / (1.0 + np.exp(exponent))
+    if isinstance(exponent, np.ndarray):
+        # Evaluate in place, so that no temporaries are created beyond
+        # the exponent array itself.
+        np.exp(exponent, out=exponent)
+        exponent += 1.0
+        return np.reciprocal(exponent, out=exponent)
+    else:
+        return 1.0 / (1.0 + np.exp(exponent))
 
 
 def entropy_multiplicator(energy, fermi_energy, temperature):
@@ -119,20 +182,18 @@ def entropy_multiplicator(energy, fermi_energy, temperature):
         Value of the multiplicator function.
     """
     if len(np.shape(energy)) > 0:
-        dim = np.shape(energy)[0]
-        multiplicator = np.zeros(dim, dtype=np.float64)
-        for i in range(0, np.shape(energy)[0]):
-            fermi_val = fermi_function(energy[i], fermi_energy, temperature,
-                                       suppress_overflow=True)
-            if fermi_val == 1.0:
-                secondterm = 0.0
-            else:
-                secondterm = (1 - fermi_val) * np.log(1 - fermi_val)
-            if fermi_val == 0.0:
-                firsterm = 0.0
-            else:
-                firsterm = fermi_val * np.log(fermi_val)
-            multiplicator[i] = firsterm + secondterm
+        fermi_val = fermi_function(np.asarray(energy, dtype=np.float64),
+                                   fermi_energy, temperature,
+                                   suppress_overflow=True)
+
+        # f*log(f) vanishes for f=0 and (1-f)*log(1-f) for f=1; the
+        # logarithms are masked out for these values afterwards.
+        with np.errstate(divide="ignore", invalid="ignore"):
+            firsterm = np.where(fermi_val == 0.0, 0.0,
+                                fermi_val * np.log(fermi_val))
+            secondterm = np.where(fermi_val == 1.0, 0.0,
+                                  (1 - fermi_val) * np.log(1 - fermi_val))
+        multiplicator = firsterm + secondterm
     else:
         fermi_val = fermi_function(energy, fermi_energy, temperature,
                                    suppress_overflow=True)
@@ -166,6 +227,36 @@ def get_beta(temperature):
     return 1 / (kB * temperature)
 
 
+def polylog_of_negative_exponential(order, x):
+    r"""
+    Calculate the polylogarithm :math:`\mathrm{Li}_s(-e^x)`.
+
+    This is the building block of the analytic integration formulas. If
+    fdint is available, the identity
+    :math:`\mathrm{Li}_s(-e^x) = -F_{s-1}(x)/\Gamma(s)` with the complete
+    Fermi-Dirac integral :math:`F_j` is used, which is considerably faster
+    and works on numpy arrays. Otherwise, mpmath is used.
+
+    Parameters
+    ----------
+    order : int
+        Order s of the polylogarithm.
+
+    x : float or numpy.array
+        x value for function. numpy arrays are only supported if fdint is
+        installed.
+
+    Returns
+    -------
+    function_value : float or numpy.array
+        Value of the polylogarithm.
+    """
+    if fdk is not None:
+        return -1.0 * fdk(order-1, x) / math.gamma(order)
+    else:
+        return mp.polylog(order, -1.0*mp.exp(x))
+
+
 def get_f0_value(x, beta):
     """
     Get the F0 value for the analytic integration formula.
@@ -183,7 +274,7 @@ def get_f0_value(x, beta):
     function_value : float
         F0 value.
     """
-    results = (x+mp.polylog(1, -1.0*mp.exp(x)))/beta
+    results = (x+polylog_of_negative_exponential(1, x))/beta
     return results
 
 
@@ -204,8 +295,8 @@ def get_f1_value(x, beta):
     function_value : float
         F1 value.
     """
-    results = ((x*x)/2+x*mp.polylog(1, -1.0*mp.exp(x))
-               - mp.polylog(2, -1.0*mp.exp(x))) / (beta*beta)
+    results = ((x*x)/2+x*polylog_of_negative_exponential(1, x)
+               - polylog_of_negative_exponential(2, x)) / (beta*beta)
     return results
 
 
@@ -226,9 +317,9 @@ def get_f2_value(x, beta):
     function_value : float
         F2 value.
     """
-    results = ((x*x*x)/3+x*x*mp.polylog(1, -1.0*mp.exp(x)) -
-               2*x*mp.polylog(2, -1.0*mp.exp(x)) +
-               2*mp.polylog(3, -1.0*mp.exp(x))) / (beta*beta*beta)
+    results = ((x*x*x)/3+x*x*polylog_of_negative_exponential(1, x) -
+               2*x*polylog_of_negative_exponential(2, x) +
+               2*polylog_of_negative_exponential(3, x)) / (beta*beta*beta)
     return results
 
 
@@ -249,8 +340,8 @@ def get_s0_value(x, beta):
     function_value : float
         S0 value.
     """
-    results = (-1.0*x*mp.polylog(1, -1.0*mp.exp(x)) +
-               2.0*mp.polylog(2, -1.0*mp.exp(x))) / (beta*beta)
+    results = (-1.0*x*polylog_of_negative_exponential(1, x) +
+               2.0*polylog_of_negative_exponential(2, x)) / (beta*beta)
     return results
 
 
@@ -271,9 +362,9 @@ def get_s1_value(x, beta):
     function_value : float
         S1 value.
     """
-    results = (-1.0*x*x*mp.polylog(1, -1.0*mp.exp(x)) +
-               3*x*mp.polylog(2, -1.0*mp.exp(x)) -
-               3*mp.polylog(3, -1.0*mp.exp(x))) / (beta*beta*beta)
+    results = (-1.0*x*x*polylog_of_negative_exponential(1, x) +
+               3*x*polylog_of_negative_exponential(2, x) -
+               3*polylog_of_negative_exponential(3, x)) / (beta*beta*beta)
     return results
 
 
@@ -323,6 +414,118 @@ def analytical_integration(D, I0, I1, fermi_energy, energy_grid, temperature):
     integration_value : numpy.array or float
         Value of the integral.
     """
+    # The weights only depend on the auxiliary functions, energy grid,
+    # Fermi energy and temperature, and are cached for repeated calls with
+    # the same values. At a given Fermi energy, the number of electrons,
+    # the F0/F1 part of the band energy and the density share one set of
+    # weights. The root search of the self-consistent Fermi energy does not
+    # evaluate the root it returns, so the first call at that Fermi energy
+    # always constructs the weights anew.
+    weights_vector = _analytical_integration_weights(
+        I0, I1, float(fermi_energy),
+        tuple(np.asarray(energy_grid, dtype=np.float64).tolist()),
+        float(temperature))
+
+    return integrate_with_weights(D, weights_vector)
+
+
+def integrate_with_weights(D, weights_vector):
+    """
+    Integrate (L)DOS data over the energy grid using integration weights.
+
+    Data in a different precision than the weights (e.g. single precision
+    LDOS) is upcast and contracted in chunks of grid points, so that no
+    double precision copy of the entire array is created. Data that is
+    already in double precision is contracted with a single np.dot and is
+    not chunked.
+
+    Parameters
+    ----------
+    D : numpy.array
+        Either LDOS or DOS data, with the energy grid as last axis.
+
+    weights_vector : numpy.array
+        Integration weights (in double precision), one per point of the
+        energy grid.
+
+    Returns
+    -------
+    integration_value : numpy.array or float
+        Value of the integral.
+    """
+    # Contracting single precision (LDOS) data with the weights directly
+    # would create a double precision copy of the entire array. Instead,
+    # the data is upcast in chunks of grid points, so that the
+    # accumulation is still performed in double precision.
+    D = np.asarray(D)
+    if D.ndim > 1 and D.dtype != weights_vector.dtype:
+        D_2d = D.reshape(-1, D.shape[-1])
+        integral_value = np.empty(D_2d.shape[0], dtype=np.float64)
+        chunk_size = get_chunk_size(D_2d.shape[-1] *
+                                    weights_vector.itemsize)
+        for start in range(0, D_2d.shape[0], chunk_size):
+            end = start + chunk_size
+            integral_value[start:end] = \
+                np.dot(D_2d[start:end].astype(np.float64), weights_vector)
+        integral_value = integral_value.reshape(D.shape[:-1])
+    else:
+        integral_value = np.dot(D, weights_vector)
+    return integral_value
+
+
+def get_quadrature_weights(energy_grid, method):
+    """
+    Get the weights of a numerical integration method on an energy grid.
+
+    Integrating values y with the respective scipy routine is equivalent
+    to np.dot(y, weights). The weights are cached per energy grid.
+
+    Parameters
+    ----------
+    energy_grid : numpy.array
+        Energy grid on which the integration is performed.
+
+    method : string
+        Integration method to be used. Currently supported:
+
+            - "trapz" for trapezoid method
+            - "simps" for Simpson method.
+
+    Returns
+    -------
+    weights_vector : numpy.array
+        Read-only array of integration weights, one per point of the
+        energy grid.
+    """
+    return _quadrature_weights(
+        tuple(np.asarray(energy_grid, dtype=np.float64).tolist()), method)
+
+
+@functools.lru_cache(maxsize=8)
+def _quadrature_weights(energy_grid, method):
+    # The integration methods are linear in the values, so integrating the
+    # unit vectors yields the weights of all grid points.
+    energy_grid = np.array(energy_grid, dtype=np.float64)
+    unit_vectors = np.eye(energy_grid.shape[0], dtype=np.float64)
+    if method == "trapz":
+        weights_vector = integrate.trapz(unit_vectors, energy_grid, axis=-1)
+    elif method == "simps":
+        weights_vector = integrate.simps(unit_vectors, energy_grid, axis=-1)
+    else:
+        raise Exception("Unknown integration method.")
+    weights_vector.flags.writeable = False
+    return weights_vector
+
+
+@functools.lru_cache(maxsize=8)
+def _analytical_integration_weights(I0, I1, fermi_energy, energy_grid,
+                                    temperature):
+    """
+    Construct the weights for the analytical integration.
+
+    Arguments are the same as for analytical_integration, but the energy
+    grid has to be provided as tuple, so that the weights can be cached.
+    """
     # Mappings for the functions further down.
     function_mappings = {
         "F0": get_f0_value,
@@ -338,49 +541,46 @@ def analytical_integration(D, I0, I1, fermi_energy, energy_grid, temperature):
         raise Exception("Could not calculate analytical intergal, "
                         "wrong choice of auxiliary functions.")
 
-    # Construct the weight vector.
-    weights_vector = np.zeros(energy_grid.shape, dtype=np.float64)
-    gridsize = energy_grid.shape[0]
+    # Construct the energy grid edges.
+    energy_grid = np.array(energy_grid, dtype=np.float64)
     energy_grid_edges = np.zeros(energy_grid.shape[0]+2, dtype=np.float64)
     energy_grid_edges[1:-1] = energy_grid
     spacing = (energy_grid[1]-energy_grid[0])
     energy_grid_edges[0] = energy_grid[0] - spacing
     energy_grid_edges[-1] = energy_grid[-1] + spacing
 
-    # Calculate the weights.
-    # It is not really possible to express this as a vector operation,
-    # since mp.polylog (which is called in function_mappings) does not support
-    # that.
+    # Evaluate I0 and I1 once per edge and reuse these values for all
+    # weights touching the edge, rather than re-evaluating them for every
+    # neighbouring grid point.
+    # With fdint, all edges are evaluated at once. mp.polylog does not
+    # support vector operations, so otherwise we have to loop.
     beta = 1 / (kB * temperature)
-    for i in range(0, gridsize):
-        # Some aliases for readibility
-        ei = energy_grid_edges[i+1]
-        ei_plus = energy_grid_edges[i+2]
-        ei_minus = energy_grid_edges[i]
-
-        # Calculate x
-        x = beta*(ei - fermi_energy)
-        x_plus = beta*(ei_plus - fermi_energy)
-        x_minus = beta*(ei_minus - fermi_energy)
-
-        # Calculate the I0 value
-        i0 = function_mappings[I0](x, beta)
-        i0_plus = function_mappings[I0](x_plus, beta)
-        i0_minus = function_mappings[I0](x_minus, beta)
-
-        # Calculate the I1 value
-        i1 = function_mappings[I1](x, beta)
-        i1_plus = function_mappings[I1](x_plus, beta)
-        i1_minus = function_mappings[I1](x_minus, beta)
-
-        weights_vector[i] = (i0_plus-i0) * (1 +
-                                            ((ei - fermi_energy) / (ei_plus - ei))) \
-                            + (i0-i0_minus) * (1 - ((ei - fermi_energy) / (ei - ei_minus))) - \
-                            ((i1_plus-i1) / (ei_plus-ei)) + ((i1 - i1_minus)
-                                                             / (ei - ei_minus))
-
-    integral_value = np.dot(D, weights_vector)
-    return integral_value
+    x_edges = beta*(energy_grid_edges - fermi_energy)
+    if fdk is not None:
+        i0_edges = np.asarray(function_mappings[I0](x_edges, beta),
+                              dtype=np.float64)
+        i1_edges = np.asarray(function_mappings[I1](x_edges, beta),
+                              dtype=np.float64)
+    else:
+        i0_edges = np.array([function_mappings[I0](x, beta)
+                             for x in x_edges], dtype=np.float64)
+        i1_edges = np.array([function_mappings[I1](x, beta)
+                             for x in x_edges], dtype=np.float64)
+
+    # Calculate the weights.
+    # Differences are taken between neighbouring edges, the [1:] entries
+    # belong to (ei, ei_plus) and the [:-1] entries to (ei_minus, ei).
+    delta_i0 = np.diff(i0_edges)
+    delta_i1 = np.diff(i1_edges)
+    delta_e = np.diff(energy_grid_edges)
+    ei_minus_fermi = energy_grid - fermi_energy
+    weights_vector = delta_i0[1:] * (1 + (ei_minus_fermi / delta_e[1:])) \
+        + delta_i0[:-1] * (1 - (ei_minus_fermi / delta_e[:-1])) \
+        - (delta_i1[1:] / delta_e[1:]) + (delta_i1[:-1] / delta_e[:-1])
+
+    # The weights are shared between all callers through the cache.
+    weights_vector.flags.writeable = False
+    return weights_vector
 
 
 # Define Gaussian
@@ -410,7 +610,16 @@ def gaussians(grid, centers, sigma):
 
 
     """
-    multiple_gaussians = 1.0/np.sqrt(np.pi*sigma**2) * \
-        np.exp(-1.0*((grid[np.newaxis] - centers[..., np.newaxis])/sigma)**2)
+    # Evaluated in place on a single (centers x grid) array, so that the
+    # exponential is applied to one contiguous array and no other
+    # temporaries of this size are created.
+    multiple_gaussians = np.subtract(grid[np.newaxis],
+                                     centers[..., np.newaxis],
+                                     dtype=np.float64)
+    multiple_gaussians /= sigma
+    np.square(multiple_gaussians, out=multiple_gaussians)
+    np.negative(multiple_gaussians, out=multiple_gaussians)
+    np.exp(multiple_gaussians, out=multiple_gaussians)
+    multiple_gaussians *= 1.0/np.sqrt(np.pi*sigma**2)
 
     return multiple_gaussians
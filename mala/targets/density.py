@@ -855,7 +855,10 @@ class Density(Target):
     def __setup_total_energy_module(self, density_data, atoms_Angstrom,
                                     create_file=True, qe_input_data=None,
                                     qe_pseudopotentials=None):
-        if create_file:
+        # Quantum Espresso only reads the input file upon initialization,
+        # so once the total energy module is running, writing it again
+        # would only cause unnecessary file I/O.
+        if create_file and Density.te_mutex is False:
             # If not otherwise specified, use values as read in.
             if qe_input_data is None:
                 qe_input_data = self.qe_input_data
@@ -2,7 +2,7 @@
 from functools import cached_property
 
 import ase.io
-from ase.units import Rydberg, J
+from ase.units import Rydberg, J, kB
 import numpy as np
 from scipy import interpolate, integrate
 from scipy.optimize import toms748
@@ -409,14 +409,16 @@ class DOS(Target):
         energy_grid = self.energy_grid
         return_dos_values = []
 
-        # Open the file, then iterate through its contents.
+        # Open the file, then iterate through its contents. The file is
+        # streamed and only read until the energy grid is complete.
         with open(path, 'r') as infile:
-            lines = infile.readlines()
             i = 0
 
-            for dos_line in lines:
+            for dos_line in infile:
+                if i >= self.parameters.ldos_gridsize:
+                    break
                 # The first column contains the energy value.
-                if "#" not in dos_line and i < self.parameters.ldos_gridsize:
+                if "#" not in dos_line:
                     e_val = float(dos_line.split()[0])
                     dosval = float(dos_line.split()[1])
                     if np.abs(e_val-energy_grid[i]) < self.parameters.\
@@ -722,7 +724,8 @@ class DOS(Target):
 
     def get_self_consistent_fermi_energy(self, dos_data=None, temperature=None,
                                          integration_method="analytical",
-                                         broadcast_fermi_energy=True):
+                                         broadcast_fermi_energy=True,
+                                         return_number_of_electrons=False):
         r"""
         Calculate the self-consistent Fermi energy.
 
@@ -751,10 +754,19 @@ class DOS(Target):
             If True then the Fermi energy will only be calculated on one
             rank and thereafter be distributed to all other ranks.
 
+        return_number_of_electrons : bool
+            If True, the number of electrons at the self-consistent Fermi
+            energy is returned as well, so that it does not have to be
+            calculated from the (L)DOS again.
+
         Returns
         -------
         fermi_energy_self_consistent : float
             :math:`\epsilon_F` in eV.
+
+        number_of_electrons : float
+            Number of electrons at the self-consistent Fermi energy. Only
+            returned if return_number_of_electrons is True.
         """
         if dos_data is None:
             dos_data = self.density_of_states
@@ -767,33 +779,31 @@ class DOS(Target):
 
         if self.parameters._configuration["mpi"] and broadcast_fermi_energy:
             if get_rank() == 0:
-                energy_grid = self.energy_grid
-                fermi_energy_sc = toms748(lambda fermi_sc:
-                                          (self.
-                                           __number_of_electrons_from_dos
-                                           (dos_data, energy_grid,
-                                            fermi_sc, temperature,
-                                            integration_method)
-                                           - self.number_of_electrons_exact),
-                                          a=energy_grid[0],
-                                          b=energy_grid[-1])
+                fermi_energy_sc = self.\
+                    __self_consistent_fermi_energy_from_dos(dos_data,
+                                                            self.energy_grid,
+                                                            temperature,
+                                                            integration_method)
             else:
                 fermi_energy_sc = None
 
             fermi_energy_sc = get_comm().bcast(fermi_energy_sc, root=0)
             barrier()
-            return fermi_energy_sc
         else:
-            energy_grid = self.energy_grid
-            fermi_energy_sc = toms748(lambda fermi_sc:
-                                      (self.
-                                       __number_of_electrons_from_dos
-                                       (dos_data, energy_grid,
-                                        fermi_sc, temperature,
-                                        integration_method)
-                                       - self.number_of_electrons_exact),
-                                      a=energy_grid[0],
-                                      b=energy_grid[-1])
+            fermi_energy_sc = self.\
+                __self_consistent_fermi_energy_from_dos(dos_data,
+                                                        self.energy_grid,
+                                                        temperature,
+                                                        integration_method)
+
+        if return_number_of_electrons:
+            # Only a DOS integral at the converged Fermi energy.
+            number_of_electrons = self.\
+                __number_of_electrons_from_dos(dos_data, self.energy_grid,
+                                               fermi_energy_sc, temperature,
+                                               integration_method)
+            return fermi_energy_sc, number_of_electrons
+        else:
             return fermi_energy_sc
 
     def get_density_of_states(self, dos_data=None):
@@ -854,6 +864,54 @@ class DOS(Target):
 
         return number_of_electrons
 
+    def __self_consistent_fermi_energy_from_dos(self, dos_data, energy_grid,
+                                                temperature,
+                                                integration_method):
+        """
+        Find the Fermi energy reproducing the exact number of electrons.
+
+        The root is found with TOMS 748, which converges superlinearly and
+        requires fewer evaluations of N(mu) than both bisection and
+        Brent's method.
+
+        As a heuristic, the search is started in a narrow bracket around
+        the zero temperature estimate obtained from the cumulative integral
+        of the DOS. This estimate is only meaningful for a non-negative DOS;
+        e.g. a predicted DOS with negative values can lead to an arbitrary
+        guess. Therefore, if the root does not lie within this bracket, the
+        entire energy grid is used as fallback.
+        """
+        def electron_deviation(fermi_sc):
+            return self.__number_of_electrons_from_dos(
+                dos_data, energy_grid, fermi_sc, temperature,
+                integration_method) - self.number_of_electrons_exact
+
+        # Zero temperature estimate of the Fermi energy.
+        cumulative_dos = integrate.cumulative_trapezoid(dos_data, energy_grid,
+                                                        initial=0)
+        fermi_energy_guess = np.interp(self.number_of_electrons_exact,
+                                       cumulative_dos, energy_grid)
+        bracket_width = 5 * kB * temperature + \
+            2 * (energy_grid[1] - energy_grid[0])
+        brackets = [(max(fermi_energy_guess - bracket_width, energy_grid[0]),
+                     min(fermi_energy_guess + bracket_width,
+                         energy_grid[-1])),
+                    (energy_grid[0], energy_grid[-1])]
+
+        # toms748 raises a ValueError if the root is not bracketed.
+        for lower_bound, upper_bound in brackets:
+            try:
+                fermi_energy_sc = toms748(electron_deviation,
+                                          a=lower_bound, b=upper_bound)
+                break
+            except ValueError:
+                pass
+        else:
+            raise Exception("Could not determine the self-consistent Fermi "
+                            "energy, the exact number of electrons cannot be "
+                            "reproduced on the given energy grid.")
+        return fermi_energy_sc
+
     @staticmethod
     def __band_energy_from_dos(dos_data, energy_grid, fermi_energy,
                                temperature, integration_method):
@@ -4,7 +4,6 @@ from functools import cached_property
 from ase.units import Rydberg, Bohr, J, m
 import math
 import numpy as np
-from scipy import integrate
 
 from mala.common.parallelizer import get_comm, printout, get_rank, get_size, \
     barrier
@@ -13,7 +12,8 @@ from mala.targets.cube_parser import read_cube
 from mala.targets.xsf_parser import read_xsf
 from mala.targets.target import Target
 from mala.targets.calculation_helpers import fermi_function, \
-    analytical_integration, integrate_values_on_spacing
+    analytical_integration, integrate_values_on_spacing, \
+    get_quadrature_weights, integrate_with_weights
 from mala.targets.dos import DOS
 from mala.targets.density import Density
 
@@ -934,7 +934,8 @@ class LDOS(Target):
     def get_self_consistent_fermi_energy(self, ldos_data=None, voxel=None,
                                          temperature=None,
                                          grid_integration_method="summation",
-                                         energy_integration_method="analytical"):
+                                         energy_integration_method="analytical",
+                                         return_number_of_electrons=False):
         r"""
         Calculate the self-consistent Fermi energy.
 
@@ -972,10 +973,20 @@ class LDOS(Target):
             Voxel to be used for grid intergation. Needs to reflect the
             symmetry of the simulation cell. In Bohr.
 
+        return_number_of_electrons : bool
+            If True, the number of electrons at the self-consistent Fermi
+            energy is returned as well. This is calculated from the DOS
+            used during the search, so that no further pass over the LDOS
+            is necessary.
+
         Returns
         -------
         fermi_energy_self_consistent : float
             :math:`\epsilon_F` in eV.
+
+        number_of_electrons : float
+            Number of electrons at the self-consistent Fermi energy. Only
+            returned if return_number_of_electrons is True.
         """
         if ldos_data is None and self.local_density_of_states is None:
             raise Exception("No LDOS data provided, cannot calculate"
@@ -995,9 +1006,15 @@ class LDOS(Target):
             return dos_calculator. \
                 get_self_consistent_fermi_energy(dos_data,
                                                  temperature=temperature,
-                                                 integration_method=energy_integration_method)
+                                                 integration_method=energy_integration_method,
+                                                 return_number_of_electrons=
+                                                 return_number_of_electrons)
         else:
-            return self._density_of_states_calculator.fermi_energy
+            if return_number_of_electrons:
+                return self._density_of_states_calculator.fermi_energy, \
+                       self._density_of_states_calculator.number_of_electrons
+            else:
+                return self._density_of_states_calculator.fermi_energy
 
     def get_density(self, ldos_data=None, fermi_energy=None, temperature=None,
                     conserve_dimensions=False, integration_method="analytical",
@@ -1093,12 +1110,14 @@ class LDOS(Target):
                                       suppress_overflow=True)
 
         # Calculate the number of electrons.
-        if integration_method == "trapz":
-            density_values = integrate.trapz(ldos_data_used * fermi_values,
-                                             energy_grid, axis=-1)
-        elif integration_method == "simps":
-            density_values = integrate.simps(ldos_data_used * fermi_values,
-                                             energy_grid, axis=-1)
+        if integration_method == "trapz" or integration_method == "simps":
+            # Both methods are linear, so the density is a single
+            # contraction of the LDOS with the integration weights
+            # multiplied by the Fermi function.
+            weights_vector = fermi_values * \
+                get_quadrature_weights(energy_grid, integration_method)
+            density_values = integrate_with_weights(ldos_data_used,
+                                                    weights_vector)
         elif integration_method == "analytical":
             density_values = analytical_integration(ldos_data_used, "F0", "F1",
                                                     fermi_energy, energy_grid,
@@ -1349,20 +1368,24 @@ class LDOS(Target):
                 # print("sendcounts: {}, total: {}".format(sendcounts,
                 #                                          sum(sendcounts)))
 
-                # Preparing the list of buffers.
-                density_list = []
-                for i in range(0, get_size()):
-                    density_list.append(np.empty(sendcounts[i]*4,
-                                                 dtype=np.float64))
+                # Preparing one buffer for all ranks; the data of the
+                # individual ranks are views into it.
+                displacements = np.concatenate(([0],
+                                                np.cumsum(sendcounts*4)))
+                density_buffer = np.empty(displacements[-1],
+                                          dtype=np.float64)
                 # No MPI necessary for first rank. For all the others,
                 # collect the buffers.
-                density_list[0] = density_values
+                np.copyto(density_buffer[:displacements[1]],
+                          np.reshape(density_values, -1))
                 for i in range(1, get_size()):
-                    comm.Recv(density_list[i], source=i,
-                              tag=100+i)
-                    density_list[i] = \
-                        np.reshape(density_list[i],
-                                   (sendcounts[i], 4))
+                    comm.Recv(density_buffer[displacements[i]:
+                                             displacements[i+1]],
+                              source=i, tag=100+i)
+                density_list = [np.reshape(density_buffer[displacements[i]:
+                                                          displacements[i+1]],
+                                           (sendcounts[i], 4))
+                                for i in range(0, get_size())]
             else:
                 comm.Send(density_values, dest=0, tag=get_rank()+100)
             barrier()
@@ -1,3 +1,4 @@
+import importlib
 import os
 
 from mala import LDOS, Density, DOS, Parameters, printout
@@ -95,6 +96,83 @@ class TestMALAIntegration:
         assert np.isclose(error1, 0, atol=accuracy)
         assert np.isclose(error2, 0, atol=accuracy)
 
+    def test_entropy_multiplicator(self):
+        """
+        Test whether the entropy multiplicator works on arrays.
+
+        Evaluating the whole energy grid at once has to give the same values
+        as evaluating every energy separately.
+        """
+        energies = np.linspace(-20, 20, 81)
+        e_fermi = 0.5
+        temp = 298
+
+        multiplicator_array = entropy_multiplicator(energies, e_fermi, temp)
+        multiplicator_scalar = np.array([entropy_multiplicator(e, e_fermi,
+                                                               temp)
+                                         for e in energies])
+        assert np.allclose(multiplicator_array, multiplicator_scalar,
+                           atol=accuracy)
+        assert np.all(np.isfinite(multiplicator_array))
+
+    def test_fermi_function_multiple_fermi_energies(self):
+        """
+        Test whether the Fermi function works for multiple Fermi energies.
+
+        Each row has to be equal to the Fermi function for the respective
+        Fermi energy.
+        """
+        energies = np.linspace(-20, 20, 81)
+        e_fermi = np.array([-1.0, 0.5, 3.0])
+        temp = 298
+
+        fermi_values = fermi_function(energies, e_fermi, temp,
+                                      suppress_overflow=True)
+        assert fermi_values.shape == (3, 81)
+        for i in range(0, 3):
+            assert np.allclose(fermi_values[i],
+                               fermi_function(energies, e_fermi[i], temp,
+                                              suppress_overflow=True),
+                               atol=accuracy)
+
+        # Integer inputs have to be promoted to floating point values.
+        fermi_values = fermi_function(np.arange(5), np.array([1, 2]), temp)
+        assert np.allclose(fermi_values[1],
+                           fermi_function(np.arange(5.0), 2.0, temp),
+                           atol=accuracy)
+
+    def test_quadrature_weights(self):
+        """
+        Test whether integration with precomputed weights works.
+
+        Contracting with the weights has to give the same values as the
+        respective scipy routines.
+        """
+        energies = np.linspace(-5, 5, 11)
+        values = np.random.default_rng(0).random((4, 11))
+        for method, integrator in [("trapz", sp.integrate.trapz),
+                                   ("simps", sp.integrate.simps)]:
+            weights = get_quadrature_weights(energies, method)
+            assert np.allclose(integrate_with_weights(values, weights),
+                               integrator(values, energies, axis=-1),
+                               atol=accuracy)
+
+    @pytest.mark.skipif(importlib.util.find_spec("fdint") is None,
+                        reason="fdint is currently not part of the pipeline.")
+    def test_polylog_fdint(self):
+        """
+        Test whether the fdint polylogarithms agree with mpmath.
+
+        Both have to give the same values for the analytical integration.
+        """
+        x = np.array([-50.0, -3.1, -0.2, 0.0, 0.7, 4.5, 60.0])
+        for order in [1, 2, 3]:
+            fdint_values = polylog_of_negative_exponential(order, x)
+            mpmath_values = np.array([float(mp.polylog(order,
+                                                       -1.0*mp.exp(xi)))
+                                      for xi in x])
+            assert np.allclose(fdint_values, mpmath_values, rtol=accuracy)
+
     def test_qe_dens_to_nr_of_electrons(self):
         """
         Test integration of density on real space grid.
@@ -108,7 +186,7 @@ class TestMALAIntegration:
                                                          "espresso-out")
 
         # Read the input data.
-        density_dft = np.load(path_to_dens_npy)
+        density_dft = np.load(path_to_dens_npy, mmap_mode="r")
 
         # Calculate the quantities we want to compare.
         nr_mala = dens_calculator.get_number_of_electrons(density_dft)
@@ -136,8 +214,8 @@ class TestMALAIntegration:
         dens_calculator = Density.from_ldos_calculator(ldos_calculator)
 
         # Read the input data.
-        density_dft = np.load(path_to_dens_npy)
-        ldos_dft = np.load(path_to_ldos_npy)
+        density_dft = np.load(path_to_dens_npy, mmap_mode="r")
+        ldos_dft = np.load(path_to_ldos_npy, mmap_mode="r")
 
         # Calculate the quantities we want to compare.
         self_consistent_fermi_energy = ldos_calculator. \
@@ -169,8 +247,8 @@ class TestMALAIntegration:
         dos_calculator.read_additional_calculation_data(path_to_out, "espresso-out")
 
         # Read the input data.
-        ldos_dft = np.load(path_to_ldos_npy)
-        dos_dft = np.load(path_to_dos_npy)
+        ldos_dft = np.load(path_to_ldos_npy, mmap_mode="r")
+        dos_dft = np.load(path_to_dos_npy, mmap_mode="r")
 
         # Calculate the quantities we want to compare.
         dos_mala = ldos_calculator.get_density_of_states(ldos_dft)
@@ -189,7 +267,7 @@ class TestMALAIntegration:
         dos_calculator.read_additional_calculation_data(path_to_out,
                                                         "espresso-out")
 
-        dos_from_pp = np.load(path_to_dos_npy)
+        dos_from_pp = np.load(path_to_dos_npy, mmap_mode="r")
 
         # Calculate the quantities we want to compare.
         dos_calculator.read_from_qe_out()